@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+import google.generativeai as genai
+import orjson
+from cachetools import TTLCache
+
+if TYPE_CHECKING:
+    import numpy as np
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+
+class SemanticReviewCache:
+    """Per-task LRU/TTL cache of AI reviews, matched by cosine similarity of submission embeddings.
+
+    Off unless a `threshold` is given; NumPy is only imported once the cache is used.
+    """
+    def __init__(self, threshold: float | None = None, ttl: float = 3600, max_entries_per_task: int = 256, max_tasks: int = 1024):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries_per_task = max_entries_per_task
+        self.max_tasks = max_tasks
+        self._tasks: OrderedDict[str, OrderedDict[str, tuple]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        # No cosine similarity exceeds 1, so a higher threshold turns the cache off.
+        return self.threshold is not None and self.threshold <= 1
+
+    async def embed(self, text: str) -> "np.ndarray | None":
+        """Returns the normalized embedding for `text` (None for a zero vector); embedding API errors propagate."""
+        import numpy as np
+        result = await asyncio.to_thread(genai.embed_content, model=EMBEDDING_MODEL, content=text, task_type="semantic_similarity")
+        vector = np.asarray(result["embedding"], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, task_id: str, embedding: "np.ndarray"):
+        import numpy as np
+        entries = self._tasks.get(task_id)
+        if not entries:
+            return None
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _, _) in entries.items() if expires_at <= now]:
+            del entries[key]
+        if not entries:
+            del self._tasks[task_id]
+            return None
+        keys = list(entries)
+        similarities = np.stack([entries[k][1] for k in keys]) @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        entries.move_to_end(keys[best])
+        self._tasks.move_to_end(task_id)
+        return entries[keys[best]][2].model_copy(deep=True)
+
+    def store(self, task_id: str, submission_text: str, embedding: "np.ndarray", review):
+        entries = self._tasks.setdefault(task_id, OrderedDict())
+        key = hashlib.sha256(submission_text.encode()).hexdigest()
+        entries[key] = (time.monotonic() + self.ttl, embedding, review.model_copy(deep=True))
+        entries.move_to_end(key)
+        self._tasks.move_to_end(task_id)
+        while len(entries) > self.max_entries_per_task:
+            entries.popitem(last=False)
+        while len(self._tasks) > self.max_tasks:
+            self._tasks.popitem(last=False)
+
+
+class NoteCache:
+    """Exact-match cache for feedback notes; the note prompt is a pure function of the review data."""
+    def __init__(self, maxsize: int = 4096, ttl: float = 3600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def key(review_dump: dict) -> str:
+        return hashlib.sha256(orjson.dumps(review_dump, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def get(self, review_dump: dict) -> str | None:
+        return self._cache.get(self.key(review_dump))
+
+    def set(self, review_dump: dict, note: str):
+        self._cache[self.key(review_dump)] = note
@@ -0,0 +1,454 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from urllib3.util.retry import Retry
+import os
+import orjson
+import random
+import threading
+import time
+
+# Transient statuses worth retrying on GETs; other 4xx responses fail fast. A POST that timed out or got
+# a 502/504 may still be running on the agent, so a retry could start a second review. Review submissions
+# are only retried on 429/503, which arrive before any work starts; other POSTs only retry failed
+# connection attempts, which never reached the server.
+RETRY_STATUSES = [429, 502, 503, 504]
+POST_RETRY_STATUSES = [429, 503]
+REVIEW_SUBMISSION_PREFIXES = ("review/text/", "review/link/", "review/file/")
+
+# httpx errors raised before any of the request reached the server.
+_UNSENT_REQUEST_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+def _retry_statuses(method: str, endpoint: str) -> list[int]:
+    if method == "GET":
+        return RETRY_STATUSES
+    return POST_RETRY_STATUSES if endpoint.startswith(REVIEW_SUBMISSION_PREFIXES) else []
+
+def _retry_policy(allowed_methods: list[str], status_forcelist: list[int], read: int | None = None) -> Retry:
+    return Retry(
+        total=5, read=read, backoff_factor=0.25, backoff_max=8, backoff_jitter=0.1,
+        status_forcelist=status_forcelist, allowed_methods=allowed_methods, respect_retry_after_header=True,
+    )
+
+# JSON bodies above this size are gzip-compressed; the agent inflates them transparently.
+GZIP_MIN_BODY_BYTES = 1024
+
+# Shared, never mutated: requests and httpx merge per-call headers without modifying them.
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_GZIP_JSON_HEADERS = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+
+def _encode_json_body(data) -> tuple[bytes, dict]:
+    """Serializes `data` with orjson, gzipping it when large; returns the body and its headers."""
+    raw = orjson.dumps(data)
+    if len(raw) > GZIP_MIN_BODY_BYTES:
+        return gzip.compress(raw, compresslevel=5), _GZIP_JSON_HEADERS
+    return raw, _JSON_HEADERS
+
+@functools.lru_cache(maxsize=256)
+def _endpoint_url(base_url: str, endpoint: str) -> str:
+    return f"{base_url}/{endpoint}"
+
+class _CircuitBreaker:
+    """Short-circuits calls for `cooldown` seconds after `threshold` consecutive failures.
+
+    The count is kept after tripping, so the first call after the cooldown is a probe: one more
+    failure re-opens the breaker, and a success closes it.
+    """
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self._threshold = threshold
+        self._cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0.0
+
+    def allow(self) -> bool:
+        return time.monotonic() >= self._open_until
+
+    def record_success(self):
+        self._failures = 0
+
+    def record_failure(self):
+        self._failures += 1
+        if self._failures >= self._threshold:
+            self._open_until = time.monotonic() + self._cooldown
+
+def _if_none_match(etag: str | None) -> dict | None:
+    return {"If-None-Match": etag} if etag else None
+
+class _ReviewCache:
+    """Per-review payloads kept fresh for `ttl` seconds, then revalidated with the server's ETag."""
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._entries: dict[str, tuple[float, dict, str]] = {}
+
+    def get(self, review_id: str) -> tuple[bool, dict | None, str | None]:
+        """Returns (fresh, payload, etag) for `review_id`."""
+        entry = self._entries.get(review_id)
+        if entry is None:
+            return False, None, None
+        expires_at, payload, etag = entry
+        return time.monotonic() < expires_at, payload, etag
+
+    def discard(self, review_id: str):
+        self._entries.pop(review_id, None)
+
+    def update(self, review_id: str, result, cached_payload: dict | None) -> dict | None:
+        """Stores the outcome of a conditional GET and returns the payload to hand back to the caller."""
+        if result is None:
+            return None
+        payload, response = result
+        if payload is None:  # 304 Not Modified
+            payload = cached_payload
+        self._entries.pop(review_id, None)
+        self._entries[review_id] = (time.monotonic() + self._ttl, payload, response.headers.get("ETag"))
+        while len(self._entries) > self._max_entries:
+            self._entries.pop(next(iter(self._entries)))
+        return payload
+
+class TaskReviewerClient:
+    """A client to interact with the role-based Task Reviewer Agent API."""
+    def __init__(self, base_url: str, api_key: str, review_cache_ttl: float = 5.0, prewarm: bool = True):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.base_headers = {"X-API-Key": self.api_key}
+        # One pooled keep-alive session for all calls, retrying transient gateway errors.
+        self._session = requests.Session()
+        self._session.headers.update(self.base_headers)
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=_retry_policy(["GET"], RETRY_STATUSES))
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # requests picks the longest matching prefix, so review submissions also retry 429/503, but never a read error.
+        review_adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=_retry_policy(["POST"], POST_RETRY_STATUSES, read=0))
+        self._session.mount(f"{self.base_url}/review/text/", review_adapter)
+        self._session.mount(f"{self.base_url}/review/link/", review_adapter)
+        # A streamed MultipartEncoder body can't be rewound, so uploads only retry failed connects
+        # (which happen before any of the body is sent), never a status or a read error.
+        upload_retry = Retry(total=5, read=0, status=0, other=0, backoff_factor=0.25, backoff_max=8, backoff_jitter=0.1)
+        upload_adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=upload_retry)
+        self._session.mount(f"{self.base_url}/review/file/", upload_adapter)
+        self._breaker = _CircuitBreaker()
+        self._review_cache = _ReviewCache(review_cache_ttl)
+        if prewarm:
+            threading.Thread(target=self._warm, daemon=True).start()
+
+    def _warm(self):
+        """Opens a pooled connection in the background so the first real call skips the handshake."""
+        try:
+            self._session.head(self.base_url, timeout=2)
+        except requests.exceptions.RequestException:
+            pass
+
+    def close(self):
+        """Closes the underlying HTTP session and its pooled connections."""
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _send(self, method: str, endpoint: str, return_response: bool = False, **kwargs) -> dict:
+        """Sends one request through the circuit breaker and decodes the JSON reply (None on failure).
+
+        With `return_response`, returns `(payload, response)`, where payload is None for a 304.
+        The session already carries X-API-Key, so `kwargs` only adds the body and its headers.
+        """
+        if not self._breaker.allow():
+            print(f"🔴 Agent unavailable, skipping {method} /{endpoint} (circuit open).")
+            return None
+        try:
+            response = self._session.request(method, _endpoint_url(self.base_url, endpoint), timeout=30, **kwargs)
+            response.raise_for_status()
+            self._breaker.record_success()
+            payload = None if response.status_code == 304 else orjson.loads(response.content)
+            return (payload, response) if return_response else payload
+        except orjson.JSONDecodeError as e:
+            print(f"🔴 Invalid JSON response: {e}")
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code >= 500:
+                self._breaker.record_failure()
+            else:
+                self._breaker.record_success()
+            print(f"🔴 HTTP Error: {e.response.status_code} - {e.response.text}")
+        except requests.exceptions.RequestException as e:
+            self._breaker.record_failure()
+            print(f"🔴 Request failed: {e}")
+        return None
+
+    def _get(self, endpoint: str, headers: dict = None, return_response: bool = False):
+        return self._send('GET', endpoint, return_response, headers=headers)
+
+    def _post_json(self, endpoint: str, data=None):
+        if data is None:
+            return self._send('POST', endpoint)
+        body, headers = _encode_json_body(data)
+        return self._send('POST', endpoint, data=body, headers=headers)
+
+    def _post_files(self, endpoint: str, encoder: MultipartEncoder):
+        return self._send('POST', endpoint, data=encoder, headers={"Content-Type": encoder.content_type})
+
+    # --- Authentication ---
+    def admin_login(self, password: str) -> dict:
+        """Authenticates as an admin."""
+        return self._post_json("auth/admin", {"password": password})
+
+    # --- Admin Functions ---
+    def create_task_definition(self, task_id: str, title: str, description: str) -> dict:
+        """Creates the initial task definition."""
+        return self._post_json("tasks", {"task_id": task_id, "title": title, "description": description})
+
+    def create_task_definitions(self, tasks: list[dict]) -> dict:
+        """Creates many task definitions in one request; each dict needs task_id, title and description."""
+        return self._post_json("tasks/bulk", tasks)
+
+    def send_feedback_with_dhi(self, review_id: str, sentiment: str, dhi_scores: dict) -> dict:
+        """Sends admin feedback with DHI scores."""
+        self._review_cache.discard(review_id)
+        return self._post_json(f"feedback/{review_id}", {"sentiment": sentiment, "dhi_scores": dhi_scores})
+
+    def get_pending_reviews(self) -> list:
+        """(Admin) Fetches all reviews with status 'pending_feedback'."""
+        return self._get("admin/pending-reviews")
+
+    # --- User Functions ---
+    def trigger_review_with_text(self, task_id: str, username: str, submission_text: str) -> dict:
+        """(User) Triggers a review by submitting raw text."""
+        return self._post_json(f"review/text/{task_id}/{username}", {"submission_text": submission_text})
+
+    def trigger_review_with_link(self, task_id: str, username: str, submission_link: str) -> dict:
+        """(User) Triggers a review by submitting a link."""
+        return self._post_json(f"review/link/{task_id}/{username}", {"submission_link": submission_link})
+
+    def trigger_review_with_file(self, task_id: str, username: str, file_path: str) -> dict:
+        """(User) Triggers a review by uploading a file."""
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except FileNotFoundError:
+            print(f"🔴 File not found at path: {file_path}")
+            return None
+        with os.fdopen(fd, 'rb') as f:
+            # Streamed to the socket in chunks rather than assembled into one multipart body in memory.
+            encoder = MultipartEncoder(fields={'submission_file': (os.path.basename(file_path), f, 'application/octet-stream')})
+            return self._post_files(f"review/file/{task_id}/{username}", encoder)
+
+    def trigger_reviews_bulk(self, items: list[tuple[str, str, str]], max_workers: int = 16) -> list:
+        """(User) Triggers link reviews for many (task_id, username, submission_link) items concurrently."""
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda item: self.trigger_review_with_link(*item), items))
+
+    def generate_next_task(self, review_id: str) -> dict:
+        """(User) Generates the next task after feedback has been provided."""
+        self._review_cache.discard(review_id)
+        return self._post_json(f"generate-next-task/{review_id}")
+
+    def get_user_reviews(self, username: str) -> list:
+        """(User) Fetches all review submissions for a specific user."""
+        return self._get(f"user/{username}/reviews")
+
+    # --- General Data Retrieval ---
+    def get_all_tasks(self) -> list:
+        """Fetches all available task definitions."""
+        return self._get("tasks/all")
+
+    def get_review_details(self, review_id: str) -> dict:
+        """Fetches the full details for a specific review, served from a short TTL cache and revalidated by ETag."""
+        fresh, payload, etag = self._review_cache.get(review_id)
+        if fresh:
+            return payload
+        result = self._get(f"review/{review_id}", headers=_if_none_match(etag), return_response=True)
+        return self._review_cache.update(review_id, result, payload)
+
+class AsyncTaskReviewerClient:
+    """An asyncio client for the Task Reviewer Agent API, for issuing many calls concurrently.
+
+    At most `max_concurrency` requests are in flight and at most `rate_per_minute` are started
+    per minute; 429/5xx gateway responses and connection errors are retried after the server's
+    Retry-After (or exponential backoff with jitter). POSTs only retry failed connection attempts,
+    plus 429/503 for review submissions. Set `http2=True` when the agent sits behind an
+    HTTP/2-capable proxy, so concurrent calls share one connection.
+    """
+    def __init__(self, base_url: str, api_key: str, max_concurrency: int = 10, rate_per_minute: int = 60, max_retries: int = 5,
+                 http2: bool = False, review_cache_ttl: float = 5.0, prewarm: bool = True):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.base_headers = {"X-API-Key": self.api_key}
+        self.max_retries = max_retries
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url, headers=self.base_headers,
+            timeout=httpx.Timeout(60.0), limits=httpx.Limits(max_connections=50, max_keepalive_connections=20), http2=http2,
+        )
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._rate_per_sec = rate_per_minute / 60
+        self._bucket_capacity = max(1, max_concurrency)
+        self._tokens = float(self._bucket_capacity)
+        self._last_refill = time.monotonic()
+        self._bucket_lock = asyncio.Lock()
+        self._breaker = _CircuitBreaker()
+        self._review_cache = _ReviewCache(review_cache_ttl)
+        self._prewarm = prewarm
+        self._warm_task: asyncio.Task | None = None
+
+    async def _warm(self):
+        """Opens a pooled connection in the background so the first real call skips the handshake."""
+        try:
+            await self._client.head("/", timeout=2)
+        except httpx.HTTPError:
+            pass
+
+    async def _acquire_token(self):
+        """Waits until the token bucket allows another request to start."""
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._bucket_capacity, self._tokens + (now - self._last_refill) * self._rate_per_sec)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate_per_sec)
+
+    @staticmethod
+    def _retry_delay(response: httpx.Response | None, attempt: int) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return min(8.0, 0.25 * 2 ** attempt) + random.random() * 0.1
+
+    async def aclose(self):
+        """Closes the underlying HTTP client and its pooled connections."""
+        if self._warm_task is not None:
+            self._warm_task.cancel()
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        if self._prewarm:
+            self._warm_task = asyncio.create_task(self._warm())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _request(self, method: str, endpoint: str, data: dict = None, files: dict = None,
+                       extra_headers: dict = None, return_response: bool = False) -> dict:
+        """Helper method to handle different types of requests.
+
+        With `return_response`, returns `(payload, response)`, where payload is None for a 304.
+        """
+        if method.upper() not in ('POST', 'GET'):
+            raise ValueError("Unsupported HTTP method")
+        if not self._breaker.allow():
+            print(f"🔴 Agent unavailable, skipping {method.upper()} /{endpoint} (circuit open).")
+            return None
+        retry_statuses = _retry_statuses(method.upper(), endpoint)
+        body, headers = _encode_json_body(data) if data is not None else (None, None)
+        if extra_headers:
+            headers = {**(headers or {}), **extra_headers}
+        try:
+            async with self._sem:
+                for attempt in range(self.max_retries + 1):
+                    await self._acquire_token()
+                    for _, file_obj in (files or {}).values():
+                        file_obj.seek(0)  # a retried upload must resend the file from the start
+                    try:
+                        response = await self._client.request(method.upper(), f"/{endpoint}", content=body, headers=headers, files=files)
+                    except httpx.TransportError as e:
+                        if attempt == self.max_retries or not (method.upper() == 'GET' or isinstance(e, _UNSENT_REQUEST_ERRORS)):
+                            raise
+                        await asyncio.sleep(self._retry_delay(None, attempt))
+                        continue
+                    if response.status_code not in retry_statuses or attempt == self.max_retries:
+                        break
+                    await asyncio.sleep(self._retry_delay(response, attempt))
+            if response.status_code != 304:  # httpx treats every non-2xx, 304 included, as an error
+                response.raise_for_status()
+            self._breaker.record_success()
+            payload = None if response.status_code == 304 else orjson.loads(response.content)
+            return (payload, response) if return_response else payload
+        except orjson.JSONDecodeError as e:
+            print(f"🔴 Invalid JSON response: {e}")
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code >= 500:
+                self._breaker.record_failure()
+            else:
+                self._breaker.record_success()
+            print(f"🔴 HTTP Error: {e.response.status_code} - {e.response.text}")
+        except httpx.RequestError as e:
+            self._breaker.record_failure()
+            print(f"🔴 Request failed: {e}")
+        return None
+
+    # --- Authentication ---
+    async def admin_login(self, password: str) -> dict:
+        """Authenticates as an admin."""
+        return await self._request('POST', "auth/admin", data={"password": password})
+
+    # --- Admin Functions ---
+    async def create_task_definition(self, task_id: str, title: str, description: str) -> dict:
+        """Creates the initial task definition."""
+        return await self._request('POST', "tasks", data={"task_id": task_id, "title": title, "description": description})
+
+    async def create_task_definitions(self, tasks: list[dict]) -> dict:
+        """Creates many task definitions in one request; each dict needs task_id, title and description."""
+        return await self._request('POST', "tasks/bulk", data=tasks)
+
+    async def send_feedback_with_dhi(self, review_id: str, sentiment: str, dhi_scores: dict) -> dict:
+        """Sends admin feedback with DHI scores."""
+        self._review_cache.discard(review_id)
+        return await self._request('POST', f"feedback/{review_id}", data={"sentiment": sentiment, "dhi_scores": dhi_scores})
+
+    async def get_pending_reviews(self) -> list:
+        """(Admin) Fetches all reviews with status 'pending_feedback'."""
+        return await self._request('GET', "admin/pending-reviews")
+
+    # --- User Functions ---
+    async def trigger_review_with_text(self, task_id: str, username: str, submission_text: str) -> dict:
+        """(User) Triggers a review by submitting raw text."""
+        return await self._request('POST', f"review/text/{task_id}/{username}", data={"submission_text": submission_text})
+
+    async def trigger_review_with_link(self, task_id: str, username: str, submission_link: str) -> dict:
+        """(User) Triggers a review by submitting a link."""
+        return await self._request('POST', f"review/link/{task_id}/{username}", data={"submission_link": submission_link})
+
+    async def trigger_review_with_file(self, task_id: str, username: str, file_path: str) -> dict:
+        """(User) Triggers a review by uploading a file."""
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except FileNotFoundError:
+            print(f"🔴 File not found at path: {file_path}")
+            return None
+        with os.fdopen(fd, 'rb') as f:
+            files = {'submission_file': (os.path.basename(file_path), f)}
+            return await self._request('POST', f"review/file/{task_id}/{username}", files=files)
+
+    async def trigger_reviews_bulk(self, items: list[tuple[str, str, str]]) -> list:
+        """(User) Triggers link reviews for many (task_id, username, submission_link) items concurrently."""
+        # Concurrency and rate are already bounded per request by the client's semaphore and token bucket.
+        return await asyncio.gather(*[self.trigger_review_with_link(*item) for item in items])
+
+    async def generate_next_task(self, review_id: str) -> dict:
+        """(User) Generates the next task after feedback has been provided."""
+        self._review_cache.discard(review_id)
+        return await self._request('POST', f"generate-next-task/{review_id}")
+
+    async def get_user_reviews(self, username: str) -> list:
+        """(User) Fetches all review submissions for a specific user."""
+        return await self._request('GET', f"user/{username}/reviews")
+
+    # --- General Data Retrieval ---
+    async def get_all_tasks(self) -> list:
+        """Fetches all available task definitions."""
+        return await self._request('GET', "tasks/all")
+
+    async def get_review_details(self, review_id: str) -> dict:
+        """Fetches the full details for a specific review, served from a short TTL cache and revalidated by ETag."""
+        fresh, payload, etag = self._review_cache.get(review_id)
+        if fresh:
+            return payload
+        result = await self._request('GET', f"review/{review_id}", extra_headers=_if_none_match(etag), return_response=True)
+        return self._review_cache.update(review_id, result, payload)